@@ -120,6 +120,11 @@ class DuckDBCredentials(Credentials):
     # local DuckDB files, but this is a way to override that behavior)
     keep_open: bool = False
 
+    # The maximum number of idle DuckDB cursors to keep around for reuse by
+    # new connections (they are created on demand, so this is not a limit on
+    # the number of cursors that can be open at the same time)
+    pool_size: int = 8
+
     # A list of paths to Python modules that should be loaded into the
     # running Python environment when dbt is invoked; this is useful for
     # loading custom dbt-duckdb plugins or locally defined modules that
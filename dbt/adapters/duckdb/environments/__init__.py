@@ -1,10 +1,16 @@
 import abc
-import importlib.util
+import hashlib
+import linecache
+import marshal
 import os
+import re
 import sys
-import tempfile
+import time
+import types
+from typing import Any
 from typing import Dict
 from typing import Optional
+from typing import Tuple
 
 import duckdb
 
@@ -16,6 +22,92 @@ from dbt.contracts.connection import AdapterResponse
 from dbt.exceptions import DbtRuntimeError
 
 
+# Python model modules that have already been loaded in this process, keyed
+# by a hash of their compiled code
+_MODULE_CACHE: Dict[bytes, types.ModuleType] = {}
+
+
+# Cached bytecode that hasn't been used for this long is removed from the cache
+_BYTECODE_CACHE_TTL = 30 * 24 * 60 * 60
+
+
+def _bytecode_cache_dir() -> Optional[str]:
+    # Setting DBT_DUCKDB_BYTECODE_CACHE_DIR to an empty string turns the cache off
+    cache_dir = os.environ.get("DBT_DUCKDB_BYTECODE_CACHE_DIR")
+    if cache_dir is not None:
+        return cache_dir or None
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache_home, "dbt-duckdb", "pymodels")
+
+
+def _bytecode_cache_path(filename: str, source: str) -> Optional[str]:
+    # The marshal format is specific to the Python version, so only cache
+    # bytecode when the interpreter tells us which version it is
+    tag = sys.implementation.cache_tag
+    cache_dir = _bytecode_cache_dir()
+    if tag is None or cache_dir is None:
+        return None
+    key = f"{filename}\0{source}".encode("utf-8")
+    digest = hashlib.blake2b(key, digest_size=16).hexdigest()
+    # compile() strips asserts/docstrings depending on the interpreter's -O level,
+    # so (like __pycache__) bytecode is only shared between runs at the same level
+    return os.path.join(cache_dir, f"{digest}.{tag}.opt-{sys.flags.optimize}.pyc")
+
+
+# The names of the files we write into the cache directory (which may be shared with
+# other tools), so that pruning it never touches anything else
+_BYTECODE_CACHE_FILE = re.compile(r"[0-9a-f]{32}\.[\w-]+\.opt-\d+\.pyc(\.\d+\.tmp)?")
+
+
+def _prune_bytecode_cache(cache_dir: str):
+    cutoff = time.time() - _BYTECODE_CACHE_TTL
+    try:
+        with os.scandir(cache_dir) as entries:
+            for entry in entries:
+                if _BYTECODE_CACHE_FILE.fullmatch(entry.name) and entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+    except OSError:
+        pass
+
+
+def _compile_python_model(filename: str, source: str) -> types.CodeType:
+    """
+    Compiles the source of a Python model, reusing the bytecode written by a previous
+    dbt process for the same source if there is one.
+    """
+    path = _bytecode_cache_path(filename, source)
+    if path:
+        try:
+            with open(path, "rb") as f:
+                code = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            code = None
+        if isinstance(code, types.CodeType):
+            try:
+                # Mark the entry as recently used so that it isn't pruned
+                os.utime(path)
+            except OSError:
+                # e.g. the cache directory is read-only
+                pass
+            return code
+
+    code = compile(source, filename, "exec")
+    if path:
+        # Write to a temporary file first so that concurrent dbt processes
+        # never see a partially written cache entry
+        cache_dir = os.path.dirname(path)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                marshal.dump(code, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+        _prune_bytecode_cache(cache_dir)
+    return code
+
+
 def _ensure_event_loop():
     """
     Ensures the current thread has an event loop defined, and creates one if necessary.
@@ -46,6 +138,12 @@ class Environment(abc.ABC):
                 if path not in sys.path:
                     sys.path.append(path)
 
+        # The settings only need to be resolved once per environment, unless they
+        # come from a credential provider (whose credentials may expire)
+        self._settings: Optional[Tuple[Tuple[str, Any], ...]] = None
+        if not creds.use_credential_provider:
+            self._settings = tuple(creds.load_settings().items())
+
     @property
     def creds(self) -> DuckDBCredentials:
         return self._creds
@@ -76,11 +174,23 @@ class Environment(abc.ABC):
         config = creds.config_options or {}
         conn = duckdb.connect(creds.path, read_only=False, config=config)
 
-        # install any extensions on the connection
+        # install any extensions on the connection, skipping the ones that
+        # are already installed/loaded so we don't hit the network or disk
         if creds.extensions is not None:
+            installed, loaded = set(), set()
+            rows = conn.execute(
+                "SELECT extension_name, installed, loaded FROM duckdb_extensions()"
+            ).fetchall()
+            for name, is_installed, is_loaded in rows:
+                if is_installed:
+                    installed.add(name)
+                if is_loaded:
+                    loaded.add(name)
             for extension in creds.extensions:
-                conn.install_extension(extension)
-                conn.load_extension(extension)
+                if extension not in installed:
+                    conn.install_extension(extension)
+                if extension not in loaded:
+                    conn.load_extension(extension)
 
         # Attach any fsspec filesystems on the database
         if creds.filesystems:
@@ -105,12 +215,18 @@ class Environment(abc.ABC):
 
         return conn
 
-    @classmethod
-    def initialize_cursor(cls, creds: DuckDBCredentials, cursor):
-        for key, value in creds.load_settings().items():
-            # Okay to set these as strings because DuckDB will cast them
-            # to the correct type
-            cursor.execute(f"SET {key} = '{value}'")
+    def cursor_settings(self) -> Tuple[Tuple[str, Any], ...]:
+        if self._settings is not None:
+            return self._settings
+        return tuple(self.creds.load_settings().items())
+
+    def initialize_cursor(self, cursor):
+        # Okay to set these as strings because DuckDB will cast them
+        # to the correct type; all of the settings are sent as a single
+        # script so that we only make one round trip per cursor
+        script = ";\n".join(f"SET {key} = '{value}'" for key, value in self.cursor_settings())
+        if script:
+            cursor.execute(script)
         return cursor
 
     @classmethod
@@ -125,28 +241,32 @@ class Environment(abc.ABC):
         return ret
 
     @classmethod
-    def run_python_job(cls, con, load_df_function, identifier: str, compiled_code: str):
-        mod_file = tempfile.NamedTemporaryFile(suffix=".py", delete=False)
-        mod_file.write(compiled_code.lstrip().encode("utf-8"))
-        mod_file.close()
+    def load_python_module(cls, identifier: str, compiled_code: str) -> types.ModuleType:
+        key = hashlib.blake2b(compiled_code.encode("utf-8")).digest()
+        module = _MODULE_CACHE.get(key)
+        if module is not None:
+            return module
+
+        # Build the module directly from the code we already have in memory, and
+        # register the source with linecache so that tracebacks can still show it
+        source = compiled_code.lstrip()
+        filename = f"<dbt:{identifier}>"
+        linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+        module = types.ModuleType(identifier)
+        module.__file__ = filename
+        exec(_compile_python_model(filename, source), module.__dict__)
+
+        _MODULE_CACHE[key] = module
+        return module
 
+    @classmethod
+    def run_python_job(cls, con, load_df_function, identifier: str, compiled_code: str):
         # Ensure that we have an event loop for async code to use since we may
         # be running inside of a thread that doesn't have one defined
         _ensure_event_loop()
 
         try:
-            spec = importlib.util.spec_from_file_location(identifier, mod_file.name)
-            if not spec:
-                raise DbtRuntimeError(
-                    "Failed to load python model as module: {}".format(identifier)
-                )
-            module = importlib.util.module_from_spec(spec)
-            if spec.loader:
-                spec.loader.exec_module(module)
-            else:
-                raise DbtRuntimeError(
-                    "Python module spec is missing loader: {}".format(identifier)
-                )
+            module = cls.load_python_module(identifier, compiled_code)
 
             # Do the actual work to run the code here
             dbt = module.dbtObj(load_df_function)
@@ -154,8 +274,6 @@ class Environment(abc.ABC):
             module.materialize(df, con)
         except Exception as err:
             raise DbtRuntimeError(f"Python model failed:\n" f"{err}")
-        finally:
-            os.unlink(mod_file.name)
 
 
 def create(creds: DuckDBCredentials) -> Environment:
@@ -1,4 +1,6 @@
 import json
+import queue
+from typing import Any
 
 import psycopg2
 
@@ -7,6 +9,48 @@ from .. import credentials
 from .. import utils
 from dbt.contracts.connection import AdapterResponse
 
+try:
+    import orjson
+
+    def _dumps(payload: Any) -> str:
+        # orjson is much faster than the json module at encoding large
+        # strings, like the compiled code of a Python model
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+except ImportError:
+
+    def _dumps(payload: Any) -> str:
+        return json.dumps(payload)
+
+
+# Only the module name and definition change from one Python job to the next,
+# so the rest of the payload is written out once and the values are encoded
+# into it on their own
+_PYTHON_JOB_PAYLOAD = (
+    '{{"method":"dbt_python_job","params":{{"module_name":{},"module_definition":{}}}}}'
+).format
+
+
+class BVConnectionWrapper:
+    def __init__(self, conn, env):
+        self._conn = conn
+        self._env = env
+        self._closed = False
+
+    # forward along all non-close() methods/attribute look-ups
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self):
+        return self._conn.cursor()
+
+    def close(self):
+        # The underlying connection is handed back to the environment so that
+        # it can be reused by the next handle instead of being closed
+        if not self._closed:
+            self._closed = True
+            self._env.notify_closed(self._conn)
+
 
 class BVEnvironment(Environment):
     @classmethod
@@ -21,30 +65,51 @@ class BVEnvironment(Environment):
 
     def __init__(self, credentials: credentials.DuckDBCredentials):
         super().__init__(credentials)
+        # Idle connections that have already been initialized with our settings
+        self._pool: queue.LifoQueue = queue.LifoQueue(maxsize=credentials.pool_size)
         if not self.creds.remote:
             raise Exception("BVConnection only works with a remote host")
 
+    def notify_closed(self, conn):
+        if conn.closed:
+            return
+        try:
+            # psycopg2 implicitly opens a transaction, so end it before the
+            # connection is reused (closing it would have done the same)
+            conn.rollback()
+            self._pool.put_nowait(conn)
+        except (psycopg2.Error, queue.Full):
+            conn.close()
+
     def handle(self):
-        # Extensions/settings need to be configured per cursor
-        conn = self._get_conn(self.creds.database, self.creds.remote)
-        cursor = self.initialize_cursor(self.creds, conn.cursor())
-        cursor.close()
-        return conn
+        try:
+            conn = self._pool.get_nowait()
+            fresh = False
+        except queue.Empty:
+            conn = self._get_conn(self.creds.database, self.creds.remote)
+            fresh = True
+        # Settings need to be configured per connection, and again on reuse
+        # if they come from a credential provider
+        if fresh or self._settings is None:
+            cursor = self.initialize_cursor(conn.cursor())
+            cursor.close()
+        return BVConnectionWrapper(conn, self)
+
+    def initialize_cursor(self, cursor):
+        # Buena Vista decides how to handle a SET statement by looking at the
+        # first setting in it, so each setting has to be sent on its own
+        for key, value in self.cursor_settings():
+            cursor.execute(f"SET {key} = '{value}'")
+        return cursor
 
     def get_binding_char(self) -> str:
         return "%s"
 
     def submit_python_job(self, handle, parsed_model: dict, compiled_code: str) -> AdapterResponse:
         identifier = parsed_model["alias"]
-        payload = {
-            "method": "dbt_python_job",
-            "params": {
-                "module_name": identifier,
-                "module_definition": compiled_code,
-            },
-        }
+        payload = _PYTHON_JOB_PAYLOAD(_dumps(identifier), _dumps(compiled_code))
         # TODO: handle errors here
-        handle.cursor().execute(json.dumps(payload))
+        handle.cursor().execute(payload)
         return AdapterResponse(_message="OK")
 
     def load_source(self, plugin_name: str, source_config: utils.SourceConfig):
@@ -57,7 +122,7 @@ class BVEnvironment(Environment):
             },
         }
         cursor = handle.cursor()
-        cursor.execute(json.dumps(payload))
+        cursor.execute(_dumps(payload))
         cursor.close()
         handle.close()
 
@@ -71,6 +136,16 @@ class BVEnvironment(Environment):
             },
         }
         cursor = handle.cursor()
-        cursor.execute(json.dumps(payload))
+        cursor.execute(_dumps(payload))
         cursor.close()
         handle.close()
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def __del__(self):
+        self.close()
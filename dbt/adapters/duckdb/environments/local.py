@@ -1,4 +1,9 @@
 import threading
+from typing import Dict
+from typing import List
+from typing import Optional
+
+import duckdb
 
 from . import Environment
 from .. import credentials
@@ -7,15 +12,128 @@ from dbt.contracts.connection import AdapterResponse
 from dbt.exceptions import DbtRuntimeError
 
 
+def _database_key(creds: credentials.DuckDBCredentials) -> Optional[str]:
+    # In-memory databases are private to the environment that creates them
+    if creds.path == ":memory:":
+        return None
+    return repr(tuple(getattr(creds, field) for field in _DATABASE_FIELDS))
+
+
+# The credential fields that determine how a database gets initialized
+_DATABASE_FIELDS = (
+    "path",
+    "config_options",
+    "extensions",
+    "settings",
+    "use_credential_provider",
+    "attach",
+    "filesystems",
+    "plugins",
+)
+
+
+class _Database:
+    """
+    A DuckDB database connection that is shared by all of the LocalEnvironments in
+    this process that open the same database with the same configuration.
+    """
+
+    def __init__(self, key: Optional[str]):
+        self.key = key
+        # The connection is opened by the first environment that uses the database,
+        # while holding this lock so that the others wait for it to finish
+        self.conn = None
+        self.refs = 0
+        self.lock = threading.Lock()
+
+    def release(self):
+        with _DB_LOCK:
+            self.refs -= 1
+            if self.refs > 0:
+                return
+            if self.key and _DB_CACHE.get(self.key) is self:
+                del _DB_CACHE[self.key]
+        if self.conn is not None:
+            self.conn.close()
+
+
+# The databases that are currently open in this process, so that we don't
+# re-open (and lose the buffer cache of) a database another environment is using
+_DB_CACHE: Dict[str, _Database] = {}
+# Only held while looking up or updating the cache entries; this is reentrant because
+# releasing a database can happen in a finalizer that runs while the lock is held
+_DB_LOCK = threading.RLock()
+
+
+# Checks for temporary tables/views that a model (e.g. an incremental one) left
+# behind on a cursor, which would get in the way of whoever reuses the cursor; this
+# scans every attached catalog, so it only runs for cursors that may have created some
+_TEMP_OBJECTS_SQL = (
+    "SELECT EXISTS (SELECT 1 FROM duckdb_tables() WHERE temporary)"
+    " OR EXISTS (SELECT 1 FROM duckdb_views() WHERE temporary AND NOT internal)"
+)
+
+
+def _reset_cursor(cursor, check_temp_objects: bool) -> bool:
+    """
+    Ends any transaction that was left open on a cursor that is about to be reused,
+    and returns whether the cursor is in a clean enough state to be reused at all.
+    """
+    try:
+        cursor.rollback()
+    except duckdb.TransactionException:
+        # There was no transaction active on the cursor
+        pass
+    except duckdb.Error:
+        return False
+    # The result is always read in full so that neither it nor any result the
+    # handle left unread stays open; an open result breaks the next script the
+    # cursor executes with "cannot start a transaction within a transaction"
+    sql = _TEMP_OBJECTS_SQL if check_temp_objects else "SELECT false"
+    try:
+        return not cursor.execute(sql).fetchall()[0][0]
+    except duckdb.Error:
+        return False
+
+
 class DuckDBCursorWrapper:
-    def __init__(self, cursor):
+    __slots__ = ("_cursor", "_db", "_may_have_temp_objects")
+
+    def __init__(self, cursor, db):
         self._cursor = cursor
+        self._db = db
+        # Whether any of the SQL run on this cursor could have created temporary
+        # objects that need to be checked for before the cursor is reused
+        self._may_have_temp_objects = False
 
-    # forward along all non-execute() methods/attribute look-ups
+    # forward along any other methods/attribute look-ups that
+    # are not explicitly delegated below
     def __getattr__(self, name):
         return getattr(self._cursor, name)
 
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=1):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        return self._cursor.close()
+
     def execute(self, sql, bindings=None):
+        if not self._may_have_temp_objects and "temp" in sql.lower():
+            self._may_have_temp_objects = True
         try:
             if bindings is None:
                 return self._cursor.execute(sql)
@@ -27,12 +145,23 @@ class DuckDBCursorWrapper:
 
 class DuckDBConnectionWrapper:
     def __init__(self, cursor, env):
-        self._cursor = DuckDBCursorWrapper(cursor)
+        self._cursor = DuckDBCursorWrapper(cursor, env._db)
         self._env = env
+        self._closed = False
 
     def close(self):
-        self._cursor.close()
-        self._env.notify_closed()
+        # The underlying cursor is handed back to the environment so that
+        # it can be reused by the next handle instead of being closed
+        if not self._closed:
+            self._closed = True
+            self._env.notify_closed(self._cursor._cursor, self._cursor._may_have_temp_objects)
+
+    def rollback(self):
+        try:
+            self._cursor._cursor.rollback()
+        except duckdb.TransactionException:
+            # There was no transaction active on the cursor
+            pass
 
     def cursor(self):
         return self._cursor
@@ -44,9 +173,17 @@ class LocalEnvironment(Environment):
         # DB initialization fails
         super().__init__(credentials)
         self.conn = None
+        self._db: Optional[_Database] = None
+        self.lock = threading.RLock()
+        # Idle cursors that have already been initialized with our settings,
+        # keyed by the thread that last used them so that each thread keeps
+        # getting its own cursor back
+        self._idle_cursors: Dict[int, List] = {}
+        # The static settings as configured, before we know which of them
+        # can be set on the database instead of on every cursor
+        self._db_settings = self._settings
         self._plugins = self.initialize_plugins(credentials)
         self.handle_count = 0
-        self.lock = threading.RLock()
         self._keep_open = (
             credentials.keep_open
             or credentials.path == ":memory:"
@@ -54,26 +191,96 @@ class LocalEnvironment(Environment):
             or credentials.path.startswith("motherduck:")
         )
 
-    def notify_closed(self):
+    def notify_closed(self, cursor, may_have_temp_objects: bool = True):
         with self.lock:
             self.handle_count -= 1
             if self.handle_count == 0 and not self._keep_open:
+                cursor.close()
                 self.close()
+                return
+            db = self._db
+
+        # Make sure the cursor doesn't carry a transaction or temporary objects
+        # over to the next handle (closing it used to take care of this for us)
+        if _reset_cursor(cursor, may_have_temp_objects):
+            with self.lock:
+                idle = sum(len(c) for c in self._idle_cursors.values())
+                if self._db is db and idle < self.creds.pool_size:
+                    self._idle_cursors.setdefault(threading.get_ident(), []).append(cursor)
+                    return
+        cursor.close()
 
     def handle(self):
-        # Extensions/settings need to be configured per cursor
         with self.lock:
-            if self.conn is None:
-                self.conn = self.initialize_db(self.creds, self._plugins)
+            if self._db is None:
+                self._db = self._open_database()
+                self.conn = self._db.conn
             self.handle_count += 1
-        cursor = self.initialize_cursor(self.creds, self.conn.cursor())
+            conn = self.conn
+            cursor = self._checkout_idle_cursor()
+        if cursor is None:
+            # Extensions/settings need to be configured per cursor
+            cursor = self.initialize_cursor(conn.cursor())
         return DuckDBConnectionWrapper(cursor, self)
 
+    def _checkout_idle_cursor(self):
+        # Prefer the cursor this thread used last, but fall back to one
+        # that was released by another thread before creating a new one
+        idle = self._idle_cursors.get(threading.get_ident())
+        if not idle:
+            idle = next((c for c in self._idle_cursors.values() if c), None)
+        return idle.pop() if idle else None
+
+    def _open_database(self) -> _Database:
+        key = _database_key(self.creds)
+        with _DB_LOCK:
+            db = _DB_CACHE.get(key) if key else None
+            if db is None:
+                db = _Database(key)
+                if key:
+                    _DB_CACHE[key] = db
+            db.refs += 1
+
+        # Initializing the database can take a while (extensions, attachments...),
+        # so it only blocks the environments that are waiting on the same database
+        try:
+            with db.lock:
+                if db.conn is None:
+                    db.conn = self.initialize_db(self.creds, self._plugins)
+            self._initialize_settings(db.conn)
+        except BaseException:
+            db.release()
+            raise
+        return db
+
+    def _initialize_settings(self, conn):
+        # Settings that DuckDB allows us to set globally only need to be set once
+        # on the database; whatever is left still has to be set on each cursor
+        if self._db_settings is None:
+            return
+        cursor_settings = []
+        for key, value in self._db_settings:
+            try:
+                conn.execute(f"SET GLOBAL {key} = '{value}'")
+            except duckdb.Error:
+                cursor_settings.append((key, value))
+        self._settings = tuple(cursor_settings)
+
     def submit_python_job(self, handle, parsed_model: dict, compiled_code: str) -> AdapterResponse:
-        con = handle.cursor()
+        # Python models use the underlying DuckDB cursor directly instead of going
+        # through the wrapper; run_python_job still converts any errors they
+        # raise into a DbtRuntimeError
+        cursor = handle.cursor()
+        con = cursor._cursor
+        # There's no telling what the model does with the underlying cursor
+        cursor._may_have_temp_objects = True
 
         def ldf(table_name):
-            return con.query(f"select * from {table_name}")
+            # This returns a lazy DuckDB relation, so nothing is materialized
+            # here and DuckDB can push the model's own projections/filters
+            # down into the scan of the referenced table; each call gets its
+            # own relation since a relation keeps its result stream open
+            return con.sql(f"select * from {table_name}")
 
         self.run_python_job(con, ldf, parsed_model["alias"], compiled_code)
         return AdapterResponse(_message="OK")
@@ -110,7 +317,6 @@ class LocalEnvironment(Environment):
         cursor.execute(
             f"CREATE OR REPLACE {materialization} {source_config.table_name()} AS SELECT * FROM df"
         )
-        cursor.close()
         handle.close()
 
     def store_relation(self, plugin_name: str, target_config: utils.TargetConfig) -> None:
@@ -131,9 +337,15 @@ class LocalEnvironment(Environment):
         plugin.store(target_config)
 
     def close(self):
-        if self.conn:
-            self.conn.close()
-            self.conn = None
+        with self.lock:
+            for idle in self._idle_cursors.values():
+                for cursor in idle:
+                    cursor.close()
+            self._idle_cursors.clear()
+            if self._db:
+                self._db.release()
+                self._db = None
+                self.conn = None
 
     def __del__(self):
         self.close()
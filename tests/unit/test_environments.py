@@ -0,0 +1,395 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import duckdb
+import pytest
+
+from dbt.adapters.duckdb.credentials import DuckDBCredentials
+from dbt.adapters.duckdb.environments import _compile_python_model
+from dbt.adapters.duckdb.environments import local
+from dbt.adapters.duckdb.environments.buenavista import BVEnvironment
+from dbt.adapters.duckdb.environments.local import LocalEnvironment
+from dbt.exceptions import DbtRuntimeError
+
+
+def test_settings_are_resolved_once():
+    creds = DuckDBCredentials(settings={"threads": 4, "memory_limit": "1GB"})
+    with mock.patch.object(
+        DuckDBCredentials, "load_settings", autospec=True, side_effect=lambda c: c.settings
+    ) as load_settings:
+        env = LocalEnvironment(creds)
+        env.cursor_settings()
+        env.cursor_settings()
+    assert load_settings.call_count == 1
+    assert env.cursor_settings() == (("threads", 4), ("memory_limit", "1GB"))
+
+
+def test_credential_provider_settings_are_not_cached():
+    creds = DuckDBCredentials(use_credential_provider="aws")
+    with mock.patch.object(DuckDBCredentials, "load_settings", return_value={}) as load_settings:
+        env = LocalEnvironment(creds)
+        env.cursor_settings()
+        env.cursor_settings()
+    assert load_settings.call_count == 2
+
+
+def test_initialize_cursor_batches_settings():
+    creds = DuckDBCredentials(settings={"threads": 4, "memory_limit": "1GB"})
+    env = LocalEnvironment(creds)
+    cursor = mock.Mock()
+    env.initialize_cursor(cursor)
+    cursor.execute.assert_called_once_with("SET threads = '4';\nSET memory_limit = '1GB'")
+
+
+def test_bv_initialize_cursor_sends_settings_separately():
+    creds = DuckDBCredentials.from_dict(
+        {
+            "database": "remote",
+            "settings": {"s3_region": "us-east-1", "threads": 4},
+            "remote": {"host": "localhost", "port": 5433, "user": "test"},
+        }
+    )
+    env = BVEnvironment(creds)
+    cursor = mock.Mock()
+    env.initialize_cursor(cursor)
+    assert cursor.execute.call_args_list == [
+        mock.call("SET s3_region = 'us-east-1'"),
+        mock.call("SET threads = '4'"),
+    ]
+
+
+def test_initialize_cursor_without_settings():
+    env = LocalEnvironment(DuckDBCredentials())
+    cursor = mock.Mock()
+    env.initialize_cursor(cursor)
+    cursor.execute.assert_not_called()
+
+
+def _cursor(has_temp_objects=False):
+    cursor = mock.Mock()
+    cursor.execute.return_value.fetchall.return_value = [(has_temp_objects,)]
+    return cursor
+
+
+@mock.patch.object(LocalEnvironment, "initialize_db")
+def test_cursors_are_reused(initialize_db):
+    env = LocalEnvironment(DuckDBCredentials())
+    conn = initialize_db.return_value
+    cursors = [_cursor(), _cursor()]
+    conn.cursor.side_effect = cursors
+    first = env.handle()
+    raw = first.cursor()._cursor
+    first.close()
+    first.close()
+    second = env.handle()
+    third = env.handle()
+    assert second.cursor()._cursor is raw
+    assert third.cursor()._cursor is not raw
+    assert conn.cursor.call_count == 2
+    second.close()
+    third.close()
+    env.close()
+    conn.close.assert_called_once()
+    for cursor in cursors:
+        cursor.close.assert_called_once()
+
+
+@mock.patch.object(LocalEnvironment, "initialize_db")
+def test_failed_transactions_are_rolled_back_before_reuse(initialize_db):
+    env = LocalEnvironment(DuckDBCredentials())
+    cursor = _cursor()
+    initialize_db.return_value.cursor.side_effect = [cursor, _cursor()]
+
+    handle = env.handle()
+    handle.cursor().execute("BEGIN")
+    cursor.execute.side_effect = [RuntimeError("Conversion Error"), mock.DEFAULT]
+    try:
+        handle.cursor().execute("select 'a'::int")
+    except DbtRuntimeError:
+        pass
+    handle.close()
+
+    cursor.rollback.assert_called_once()
+    assert env.handle().cursor()._cursor is cursor
+
+
+@mock.patch.object(LocalEnvironment, "initialize_db")
+def test_cursors_without_a_transaction_are_reused(initialize_db):
+    env = LocalEnvironment(DuckDBCredentials())
+    cursor = _cursor()
+    cursor.rollback.side_effect = duckdb.TransactionException("no transaction is active")
+    initialize_db.return_value.cursor.side_effect = [cursor, _cursor()]
+    env.handle().close()
+    assert env.handle().cursor()._cursor is cursor
+
+
+@mock.patch.object(LocalEnvironment, "initialize_db")
+def test_cursors_with_temporary_objects_are_discarded(initialize_db):
+    env = LocalEnvironment(DuckDBCredentials())
+    cursor, fresh = _cursor(has_temp_objects=True), _cursor()
+    initialize_db.return_value.cursor.side_effect = [cursor, fresh]
+    handle = env.handle()
+    handle.cursor().execute("create temp table t as select 1")
+    handle.close()
+    cursor.close.assert_called_once()
+    assert env.handle().cursor()._cursor is fresh
+
+
+@mock.patch.object(LocalEnvironment, "initialize_db")
+def test_temporary_objects_are_only_checked_for_when_needed(initialize_db):
+    env = LocalEnvironment(DuckDBCredentials())
+    cursor = _cursor(has_temp_objects=True)
+    initialize_db.return_value.cursor.side_effect = [cursor, _cursor()]
+    handle = env.handle()
+    handle.cursor().execute("select 1")
+    handle.close()
+    (sql,), _ = cursor.execute.call_args
+    assert "duckdb_tables" not in sql
+
+
+def test_pooled_cursors_can_be_reused_by_duckdb():
+    env = LocalEnvironment(DuckDBCredentials())
+    handle = env.handle()
+    raw = handle.cursor()._cursor
+    # a result that the handle didn't read all of
+    handle.cursor().execute("select * from range(100000)").fetchone()
+    handle.close()
+
+    handle = env.handle()
+    assert handle.cursor()._cursor is raw
+    handle.cursor().execute("begin;\ncreate table t (x int);\ninsert into t values (1);\ncommit")
+    handle.cursor().execute("create temp table leftover as select 1")
+    handle.close()
+
+    handle = env.handle()
+    assert handle.cursor()._cursor is not raw
+    assert handle.cursor().execute("select x from t").fetchall() == [(1,)]
+    handle.close()
+    env.close()
+
+
+PYTHON_MODEL = """
+class dbtObj:
+    def __init__(self, load_df_function):
+        self.load_df_function = load_df_function
+
+def model(dbt, con):
+    return globals()
+
+def materialize(df, con):
+    con.append(df)
+"""
+
+
+def test_python_modules_are_cached(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    results = []
+    LocalEnvironment.run_python_job(results, None, "cached_model", PYTHON_MODEL)
+    LocalEnvironment.run_python_job(results, None, "cached_model", PYTHON_MODEL)
+    assert len(results) == 2
+    assert results[0] is results[1]
+
+
+@mock.patch.object(LocalEnvironment, "initialize_db")
+def test_global_settings_are_set_on_the_database(initialize_db):
+    def execute(sql):
+        if sql.startswith("SET GLOBAL integer_division"):
+            raise duckdb.Error("cannot be set globally")
+
+    conn = initialize_db.return_value
+    conn.execute.side_effect = execute
+    creds = DuckDBCredentials(settings={"threads": 4, "integer_division": True})
+    env = LocalEnvironment(creds)
+    handle = env.handle()
+    conn.execute.assert_any_call("SET GLOBAL threads = '4'")
+    handle.cursor()._cursor.execute.assert_called_once_with("SET integer_division = 'True'")
+
+
+@mock.patch("dbt.adapters.duckdb.environments.duckdb")
+def test_installed_extensions_are_skipped(connector):
+    conn = connector.connect.return_value
+    conn.execute.return_value.fetchall.return_value = [
+        ("httpfs", True, True),
+        ("json", True, False),
+        ("spatial", False, False),
+    ]
+    creds = DuckDBCredentials(extensions=("httpfs", "json", "spatial"))
+    LocalEnvironment.initialize_db(creds)
+    conn.install_extension.assert_called_once_with("spatial")
+    assert conn.load_extension.call_args_list == [mock.call("json"), mock.call("spatial")]
+
+
+@mock.patch.object(BVEnvironment, "_get_conn")
+def test_bv_connections_are_reused(get_conn):
+    conn = get_conn.return_value
+    conn.closed = 0
+    creds = DuckDBCredentials.from_dict(
+        {
+            "database": "remote",
+            "settings": {"threads": 4},
+            "remote": {"host": "localhost", "port": 5433, "user": "test"},
+        }
+    )
+    env = BVEnvironment(creds)
+    env.handle().close()
+    env.handle().close()
+    get_conn.assert_called_once()
+    conn.rollback.assert_called()
+    conn.cursor.return_value.execute.assert_called_once_with("SET threads = '4'")
+    env.close()
+    conn.close.assert_called_once()
+
+
+@mock.patch.object(LocalEnvironment, "initialize_db")
+def test_cursors_prefer_their_own_thread(initialize_db):
+    env = LocalEnvironment(DuckDBCredentials())
+    conn = initialize_db.return_value
+    conn.cursor.side_effect = [_cursor(), _cursor()]
+    main = env.handle()
+    main_cursor = main.cursor()._cursor
+
+    def run_in_thread():
+        other = env.handle()
+        other.close()
+        return other.cursor()._cursor
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        other_cursor = pool.submit(run_in_thread).result()
+    main.close()
+
+    # the main thread gets its own cursor back rather than the other thread's
+    assert env.handle().cursor()._cursor is main_cursor
+    assert env.handle().cursor()._cursor is other_cursor
+
+
+def test_python_model_bytecode_is_cached_on_disk(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    code = _compile_python_model("<dbt:disk_model>", PYTHON_MODEL)
+    cached = list((tmp_path / "dbt-duckdb" / "pymodels").iterdir())
+    assert len(cached) == 1
+
+    with mock.patch("builtins.compile") as compile_mock:
+        assert _compile_python_model("<dbt:disk_model>", PYTHON_MODEL) == code
+    compile_mock.assert_not_called()
+
+    # bytecode compiled at a different optimization level is not reused
+    with mock.patch("sys.flags", mock.Mock(optimize=1)):
+        _compile_python_model("<dbt:disk_model>", PYTHON_MODEL)
+    assert len(list((tmp_path / "dbt-duckdb" / "pymodels").iterdir())) == 2
+
+
+def test_python_model_bytecode_cache_can_be_disabled(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    monkeypatch.setenv("DBT_DUCKDB_BYTECODE_CACHE_DIR", "")
+    _compile_python_model("<dbt:uncached_model>", PYTHON_MODEL)
+    assert not (tmp_path / "dbt-duckdb").exists()
+
+
+def test_stale_python_model_bytecode_is_pruned(tmp_path, monkeypatch):
+    monkeypatch.setenv("DBT_DUCKDB_BYTECODE_CACHE_DIR", str(tmp_path))
+    stale = tmp_path / f"{'0' * 32}.cpython-311.opt-0.pyc"
+    stale_tmp = tmp_path / f"{'1' * 32}.cpython-311.opt-0.pyc.1234.tmp"
+    unrelated = tmp_path / "unrelated.pyc"
+    for path in (stale, stale_tmp, unrelated):
+        path.write_bytes(b"")
+        os.utime(path, (0, 0))
+    _compile_python_model("<dbt:fresh_model>", PYTHON_MODEL)
+    assert not stale.exists()
+    assert not stale_tmp.exists()
+    assert unrelated.exists()
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_python_model_bytecode_is_used_from_a_read_only_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("DBT_DUCKDB_BYTECODE_CACHE_DIR", str(tmp_path))
+    code = _compile_python_model("<dbt:read_only_model>", PYTHON_MODEL)
+    with mock.patch("os.utime", side_effect=PermissionError), mock.patch(
+        "builtins.compile"
+    ) as compile_mock:
+        assert _compile_python_model("<dbt:read_only_model>", PYTHON_MODEL) == code
+    compile_mock.assert_not_called()
+
+
+def test_filesystems_are_available_to_persisted_views(tmp_path):
+    creds = DuckDBCredentials(
+        path=str(tmp_path / "views.duckdb"), database="views", filesystems=[{"fs": "memory"}]
+    )
+    env = LocalEnvironment(creds)
+    cursor = env.handle().cursor()
+    cursor.execute("copy (select 42 as x) to 'memory://bucket/up.parquet' (format parquet)")
+    cursor.execute("create view up as select * from 'memory://bucket/up.parquet'")
+    env.close()
+
+    # the SQL run in the next session never mentions the filesystem
+    env = LocalEnvironment(creds)
+    handle = env.handle()
+    assert handle.cursor().execute("select * from up").fetchall() == [(42,)]
+    handle.close()
+
+
+@mock.patch.object(LocalEnvironment, "initialize_db")
+def test_databases_are_shared_between_environments(initialize_db):
+    conn = initialize_db.return_value
+    first = LocalEnvironment(DuckDBCredentials(path="/tmp/shared.duckdb", database="shared"))
+    second = LocalEnvironment(
+        DuckDBCredentials(path="/tmp/shared.duckdb", database="shared", schema="other")
+    )
+    first_handle = first.handle()
+    second_handle = second.handle()
+    initialize_db.assert_called_once()
+    assert first.conn is second.conn
+
+    first_handle.close()
+    conn.close.assert_not_called()
+    second_handle.close()
+    conn.close.assert_called_once()
+
+
+@mock.patch.object(LocalEnvironment, "initialize_db")
+def test_failed_database_initialization_is_retried(initialize_db):
+    initialize_db.side_effect = [duckdb.IOException("locked"), mock.Mock()]
+    creds = DuckDBCredentials(path="/tmp/retried.duckdb", database="retried")
+    env = LocalEnvironment(creds)
+    with pytest.raises(duckdb.IOException):
+        env.handle()
+    env.handle()
+    assert initialize_db.call_count == 2
+
+
+@mock.patch.object(LocalEnvironment, "initialize_db")
+def test_databases_can_be_released_while_the_cache_is_locked(initialize_db):
+    env = LocalEnvironment(DuckDBCredentials(path="/tmp/released.duckdb", database="released"))
+    env.handle().close()
+    # e.g. a finalizer that runs while another environment is opening a database
+    with local._DB_LOCK:
+        env.close()
+    initialize_db.return_value.close.assert_called_once()
+
+
+def test_bv_python_job_payload():
+    creds = DuckDBCredentials.from_dict(
+        {"database": "remote", "remote": {"host": "localhost", "port": 5433, "user": "test"}}
+    )
+    env = BVEnvironment(creds)
+    handle = mock.Mock()
+    env.submit_python_job(handle, {"alias": "my_model"}, 'print("{}%s")\n')
+    (payload,), _ = handle.cursor.return_value.execute.call_args
+    assert json.loads(payload) == {
+        "method": "dbt_python_job",
+        "params": {"module_name": "my_model", "module_definition": 'print("{}%s")\n'},
+    }
+
+
+def test_python_job_refs_are_independent():
+    env = LocalEnvironment(DuckDBCredentials())
+    handle = env.handle()
+    handle.cursor().execute("create table upstream as select * from range(3)")
+    with mock.patch.object(LocalEnvironment, "run_python_job") as run_python_job:
+        env.submit_python_job(handle, {"alias": "my_model"}, PYTHON_MODEL)
+    (_, ldf, _, _), _ = run_python_job.call_args
+    assert ldf("upstream").fetchone() == (0,)
+    assert ldf("upstream").fetchone() == (0,)
+    assert len(ldf("upstream").fetchall()) == 3
+    handle.close()